@@ -1,60 +1,336 @@
+import csv
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
 import pandas as pd
-import warnings
+import pyarrow as pa
+import pyarrow.compute as pc
+from numba import njit
+from openpyxl import load_workbook
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    # Без calamine читаем через openpyxl в потоковом режиме (медленнее, но без лишних объектов Cell)
+    CalamineWorkbook = None
+
+# Сюда складываются CSV-копии уже прочитанных Excel-файлов (только файлов с диска, не загрузок);
+# хранится не больше CSV_CACHE_MAX_FILES копий, давно не читанные удаляются
+CSV_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'xlcache')
+CSV_CACHE_VERSION = 3
+CSV_CACHE_MAX_FILES = 64
+
+# Разобранные листы в памяти: ключ файла -> DataFrame, самые давние вытесняются
+SHEET_CACHE_SIZE = 32
+_sheet_cache = OrderedDict()
+_sheet_cache_lock = threading.Lock()
+
+# Старый формат .xls - составной документ OLE2, узнаётся по первым байтам
+XLS_SIGNATURE = b'\xd0\xcf\x11\xe0'
+
+# Все ячейки читаются сразу в Arrow-строки; числа приводятся к числам уже после выбора столбцов
+CELL_DTYPE = 'string[pyarrow]'
+
+# Статусы заказов ищутся подстрокой в нормализованном названии (нижний регистр, ё -> е)
+DELIVERED_STATUS = re.compile('доставлен')
+CANCELLED_STATUS = re.compile('отмен')
+
+# Столбец выручки узнаётся по слову в названии
+REVENUE_COLUMN = re.compile('сумма')
+
+
+def _cell_value(value):
+    # calamine отдаёт все числа как float: 1001.0 -> 1001, иначе артикул станет "1001.0"
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    # Пустая ячейка приходит как '' - превращаем в пропуск, как это делает read_csv
+    if value == '':
+        return None
+    return value
+
+
+def _read_sheet_rows(source):
+    """
+    Первый лист Excel-файла как список строк.
+    source - путь к файлу (calamine открывает его сам, без Python-буферов) или содержимое файла (bytes).
+    """
+    is_path = isinstance(source, str)
+    # .xls узнаём по расширению пути или по сигнатуре OLE2 в начале содержимого
+    if is_path:
+        is_xls = source.lower().endswith('.xls')
+    else:
+        is_xls = source.startswith(XLS_SIGNATURE)
+    if CalamineWorkbook is not None:
+        # calamine читает и .xlsx, и старый .xls
+        wb = CalamineWorkbook.from_path(source) if is_path else CalamineWorkbook.from_filelike(BytesIO(source))
+        # skip_empty_area=False: пустые строки и столбцы в начале листа не выбрасываются,
+        # иначе заголовок выручки, который берётся по номеру строки, съедет (как и в openpyxl)
+        rows = wb.get_sheet_by_index(0).to_python(skip_empty_area=False)
+    elif is_xls:
+        # openpyxl не умеет .xls - без calamine его читает xlrd
+        import xlrd
+        if is_path:
+            book = xlrd.open_workbook(source, on_demand=True)
+        else:
+            book = xlrd.open_workbook(file_contents=source, on_demand=True)
+        # С on_demand=True xlrd держит файл открытым до release_resources - закрываем, как и openpyxl ниже
+        with book:
+            sheet = book.sheet_by_index(0)
+            rows = [sheet.row_values(i) for i in range(sheet.nrows)]
+    else:
+        # read_only + values_only: значения идут кортежами прямо из XML, без построения ячеек
+        wb = load_workbook(source if is_path else BytesIO(source), read_only=True, data_only=True)
+        try:
+            rows = list(wb.worksheets[0].iter_rows(values_only=True))
+        finally:
+            wb.close()
+    # Без тега <dimension> openpyxl отдаёт строки разной длины - дополняем их до прямоугольной
+    # таблицы, иначе записанный из них CSV-кэш потом не прочитается
+    width = max(map(len, rows), default=0)
+    return [[_cell_value(value) for value in row] + [None] * (width - len(row)) for row in rows]
+
+
+def _rows_to_frame(rows):
+    """Собирает DataFrame из строк листа так же, как _parse_excel читает CSV-кэш."""
+    return pd.DataFrame(rows, dtype=CELL_DTYPE)
+
+
+def _csv_cache_path(key):
+    # Версия формата в ключе: CSV, записанные прежним разбором листа, не подхватываются
+    return os.path.join(CSV_CACHE_DIR, hashlib.sha1(f'{CSV_CACHE_VERSION}|{key}'.encode('utf-8')).hexdigest() + '.csv')
+
+
+def _write_csv_cache(csv_path, rows):
+    # Каталог доступен только владельцу: в общем временном каталоге лежат данные из отчётов
+    os.makedirs(CSV_CACHE_DIR, mode=0o700, exist_ok=True)
+    # Пишем во временный файл и переименовываем, чтобы параллельный запрос не прочитал недописанный CSV
+    fd, tmp_path = tempfile.mkstemp(dir=CSV_CACHE_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(rows)
+        os.replace(tmp_path, csv_path)
+    except BaseException:
+        # Недописанный временный файл в кэше не оставляем
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _prune_csv_cache():
+    """Оставляет в CSV-кэше не больше CSV_CACHE_MAX_FILES файлов, удаляя самые давно читанные."""
+    cached = []
+    for entry in os.scandir(CSV_CACHE_DIR):
+        if entry.name.endswith('.csv'):
+            try:
+                cached.append((entry.stat().st_mtime_ns, entry.path))
+            except FileNotFoundError:
+                pass  # уже удалён параллельным запросом
+    cached.sort()
+    for _, path in cached[:-CSV_CACHE_MAX_FILES]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _parse_excel(key, source):
+    if isinstance(source, bytes):
+        # Загрузки на диск не пишем: повторно тот же файл почти не приходит,
+        # а данные клиентов не должны оседать в общем временном каталоге
+        return _rows_to_frame(_read_sheet_rows(source))
+
+    csv_path = _csv_cache_path(key)
+    try:
+        # Пропуском считается только пустая ячейка, как в _cell_value: текст вроде 'NA' или 'None'
+        # остаётся текстом, и таблица из кэша совпадает со свежеразобранной
+        df = pd.read_csv(csv_path, header=None, dtype=CELL_DTYPE, keep_default_na=False, na_values=[''])
+        # Время изменения - время последнего чтения: по нему _prune_csv_cache выбирает, что удалить
+        os.utime(csv_path)
+        return df
+    except OSError:
+        pass  # кэша нет или он недоступен - разбираем файл заново
+
+    # Файл встречается впервые: разбираем лист один раз, таблицу строим из уже
+    # полученных строк, а CSV сохраняем только для следующих запросов
+    rows = _read_sheet_rows(source)
+    try:
+        _write_csv_cache(csv_path, rows)
+        _prune_csv_cache()
+    except OSError as e:
+        # Кэш - только ускорение: без него (чужой каталог, нет места, диск только для чтения) работаем дальше
+        print(f"[WARN] Не удалось сохранить CSV-кэш: {e}")
+    return _rows_to_frame(rows)
+
+
+def _cached_sheet(key, source):
+    """Разобранный лист из кэша в памяти (LRU на SHEET_CACHE_SIZE таблиц)."""
+    with _sheet_cache_lock:
+        if key in _sheet_cache:
+            _sheet_cache.move_to_end(key)
+            return _sheet_cache[key]
+
+    df = _parse_excel(key, source)
+    with _sheet_cache_lock:
+        _sheet_cache[key] = df
+        _sheet_cache.move_to_end(key)
+        if len(_sheet_cache) > SHEET_CACHE_SIZE:
+            _sheet_cache.popitem(last=False)
+    return df
+
+
+def read_excel_cached(source):
+    """
+    Читает первый лист Excel-файла БЕЗ заголовков; при повторном чтении того же файла с диска - из CSV-кэша.
+    source - путь к файлу или открытый бинарный файл (например, поток загрузки Flask);
+    загруженные файлы кэшируются только в памяти.
+    Каждый файл разбирается один раз, строку заголовков выбирает уже вызывающий код.
+    Разобранная таблица дополнительно кэшируется в памяти; возвращается
+    поверхностная копия, чтобы обработка не портила закэшированный объект.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        source = os.path.abspath(source)
+        st = os.stat(source)
+        # Ключ - (путь, время изменения, размер): изменённый файл разбирается заново
+        key = f'{source}|{st.st_mtime_ns}|{st.st_size}'
+    else:
+        # Загруженный файл узнаём по содержимому
+        source = source.read()
+        key = 'sha1:' + hashlib.sha1(source).hexdigest()
+    return _cached_sheet(key, source).copy(deep=False)
+
+
+# fastmath без флага 'nnan': иначе LLVM вправе выбросить проверку цены на NaN.
+# Без parallel: ядро вызывается из потоков Flask, а слой потоков numba workqueue не потокобезопасен;
+# артикулов - тысячи, распараллеливание здесь ничего не даёт
+@njit(fastmath={'nsz', 'arcp', 'contract', 'afn', 'reassoc'}, cache=True)
+def compute_profit(revenue, sold, cost, out):
+    """
+    Прибыль по артикулам: выручка минус закупочная стоимость проданного.
+    Артикулы без цены (NaN в cost) считаются по нулевой закупке.
+    """
+    for i in range(out.size):
+        price = cost[i]
+        out[i] = revenue[i] - sold[i] * (price if price == price else 0.0)
+
+
+def _sum_by_code(codes, values, n_codes):
+    """
+    Сумма и количество значений по кодам артикулов 0..n_codes-1 (np.bincount вместо groupby).
+    Пропуски, пустые артикулы (код -1) и артикулы вне отчёта не учитываются.
+    """
+    keep = (codes >= 0) & (codes < n_codes) & ~np.isnan(values)
+    sums = np.bincount(codes[keep], weights=values[keep], minlength=n_codes)
+    counts = np.bincount(codes[keep], minlength=n_codes)
+    return sums, counts
+
+
+def _to_float(values):
+    """
+    Столбец Arrow-строк в массив float64; нечисловые значения становятся NaN.
+    Обычно весь столбец приводится одним Arrow-вычислением, и только если в нём
+    есть нечисловой текст - значения разбираются поштучно через pd.to_numeric.
+    """
+    try:
+        return pc.cast(pa.array(values.array), pa.float64()).to_numpy(zero_copy_only=False)
+    except pa.ArrowInvalid:
+        return pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def clean_columns(df):
+    """Приводит названия столбцов к нижнему регистру без пробелов по краям (на месте)."""
+    columns = df.columns
+    # Пересобираем индекс столбцов, только если хоть одно название действительно меняется
+    if any(not isinstance(col, str) or col != col.strip().lower() for col in columns):
+        df.columns = [str(col).strip().lower() for col in columns]
+    return df
+
+
+def _sniff_header(df, *keyword_groups, n_rows=10):
+    """
+    Ищет строку заголовков среди первых n_rows строк таблицы, прочитанной без заголовков.
+    Строка подходит, если в её тексте есть хотя бы одно слово из каждой группы keyword_groups.
+    Возвращает номер строки или None.
+    """
+    # Одно регулярное выражение на все ключевые слова; по совпадению узнаём, какая группа найдена
+    group_of = {keyword: i for i, group in enumerate(keyword_groups) for keyword in group}
+    pattern = re.compile('|'.join(map(re.escape, group_of)))
+    # Строки и нижний регистр - сразу для всего блока, без вызовов str() на каждую ячейку
+    block = np.char.lower(df.head(n_rows).to_numpy(dtype=str, na_value=''))
+    for i, row in enumerate(block):
+        row_text = ' '.join(row)
+        if len({group_of[match] for match in pattern.findall(row_text)}) == len(keyword_groups):
+            return i
+    return None
+
+
+def _apply_header(df, header_row):
+    """Делает строку header_row заголовками таблицы, прочитанной без заголовков, и отрезает строки над данными."""
+    df.columns = df.iloc[header_row]
+    clean_columns(df)
+    return df.iloc[header_row+1:]
+
+
+def _read_revenue(path):
+    """Файл выручки - заголовки всегда во второй строке; названия столбцов возвращаются уже очищенными."""
+    revenue_df = read_excel_cached(path)
+    if len(revenue_df) > 1:
+        return _apply_header(revenue_df, 1).reset_index(drop=True)
+    # Если второй строки нет, используем таблицу без заголовка
+    revenue_df.columns = ['артикул', 'сумма']
+    return revenue_df
 
-warnings.filterwarnings('ignore')
 
 def analyze_files(file_orders, file_revenue, file_costs):
     """
     Упрощённая и надёжная версия анализатора.
     Читает файлы БЕЗ автоматического определения заголовков.
+    Файлы передаются путями или открытыми бинарными файлами (например, потоками загрузки Flask).
     """
     print("[ANALYZER] Запуск упрощённой версии")
     
     try:
-        # 1. ФАЙЛ ЗАКАЗОВ - читаем БЕЗ заголовков
-        print("[1/3] Чтение файла заказов...")
-        orders_df = pd.read_excel(file_orders, header=None, engine='openpyxl')
-        
-        # Ищем строку с заголовками (содержит "артикул" и "статус")
-        header_row = None
-        for i in range(min(10, len(orders_df))):  # Проверяем первые 10 строк
-            row_text = ' '.join(str(cell).lower() for cell in orders_df.iloc[i] if pd.notna(cell))
-            if 'артикул' in row_text and 'статус' in row_text:
-                header_row = i
-                print(f"  Найдены заголовки в строке {i+1}")
-                break
+        # Файлы независимы друг от друга - читаем все три параллельно
+        print("[ANALYZER] Чтение файлов...")
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            orders_future = executor.submit(read_excel_cached, file_orders)
+            revenue_future = executor.submit(_read_revenue, file_revenue)
+            cost_future = executor.submit(read_excel_cached, file_costs)
+        orders_df = orders_future.result()
+        revenue_df = revenue_future.result()
+        cost_df = cost_future.result()
+        
+        # 1. ФАЙЛ ЗАКАЗОВ - прочитан БЕЗ заголовков
+        print("[1/3] Обработка файла заказов...")
         
+        # Ищем строку с заголовками (содержит "артикул" и "статус") среди первых 10 строк
+        header_row = _sniff_header(orders_df, ['артикул'], ['статус'])
         if header_row is not None:
+            print(f"  Найдены заголовки в строке {header_row+1}")
             # Используем найденную строку как заголовки
-            orders_df.columns = orders_df.iloc[header_row]
-            orders_df = orders_df.iloc[header_row+1:].reset_index(drop=True)
+            orders_df = _apply_header(orders_df, header_row)
+            print(f"  Столбцы: {list(orders_df.columns)}")
+            # Дальше нужны только два столбца - остальные не копируем
+            orders_df = orders_df[['артикул', 'статус']].reset_index(drop=True)
         else:
             # Если не нашли - используем первые два столбца
             print("  Заголовки не найдены, использую первые два столбца")
             orders_df = orders_df.iloc[:, :2]
             orders_df.columns = ['артикул', 'статус']
         
-        # Очистка названий столбцов
-        orders_df.columns = [str(col).strip().lower() for col in orders_df.columns]
-        print(f"  Столбцы: {list(orders_df.columns)}")
+        # 2. ФАЙЛ ВЫРУЧКИ
+        print("[2/3] Обработка файла выручки...")
         
-        # 2. ФАЙЛ ВЫРУЧКИ - всегда header=1 (вторая строка)
-        print("[2/3] Чтение файла выручки...")
-        try:
-            revenue_df = pd.read_excel(file_revenue, header=1, engine='openpyxl')
-        except:
-            # Если не работает header=1, пробуем без заголовка
-            revenue_df = pd.read_excel(file_revenue, header=None, engine='openpyxl')
-            revenue_df.columns = ['артикул', 'сумма']
-        
-        revenue_df.columns = [str(col).strip().lower() for col in revenue_df.columns]
-        
-        # Ищем столбец с выручкой
-        revenue_col = None
-        for col in revenue_df.columns:
-            if 'сумма' in str(col).lower():
-                revenue_col = col
-                break
+        # Ищем столбец с выручкой (названия уже очищены и в нижнем регистре)
+        revenue_col = next((col for col in revenue_df.columns if REVENUE_COLUMN.search(col)), None)
         
         if revenue_col:
             revenue_df = revenue_df[['артикул', revenue_col]]
@@ -64,86 +340,93 @@ def analyze_files(file_orders, file_revenue, file_costs):
             revenue_df = revenue_df.iloc[:, :2]
             revenue_df.columns = ['артикул', 'сумма итого, руб.']
         
-        # 3. ФАЙЛ ЦЕН - читаем БЕЗ заголовков
-        print("[3/3] Чтение файла цен...")
-        cost_df = pd.read_excel(file_costs, header=None, engine='openpyxl')
-        
-        # Ищем строку с заголовками
-        cost_header = None
-        for i in range(min(10, len(cost_df))):
-            row_text = ' '.join(str(cell).lower() for cell in cost_df.iloc[i] if pd.notna(cell))
-            if 'артикул' in row_text and ('закупоч' in row_text or 'цена' in row_text):
-                cost_header = i
-                print(f"  Найдены заголовки в строке {i+1}")
-                break
+        # 3. ФАЙЛ ЦЕН - прочитан БЕЗ заголовков
+        print("[3/3] Обработка файла цен...")
         
+        # Ищем строку с заголовками (содержит "артикул" и "закупоч" или "цена")
+        cost_header = _sniff_header(cost_df, ['артикул'], ['закупоч', 'цена'])
         if cost_header is not None:
-            cost_df.columns = cost_df.iloc[cost_header]
-            cost_df = cost_df.iloc[cost_header+1:].reset_index(drop=True)
+            print(f"  Найдены заголовки в строке {cost_header+1}")
+            cost_df = _apply_header(cost_df, cost_header)[['артикул', 'закупочная цена']].reset_index(drop=True)
         else:
             cost_df = cost_df.iloc[:, :2]
             cost_df.columns = ['артикул', 'закупочная цена']
         
-        cost_df.columns = [str(col).strip().lower() for col in cost_df.columns]
-        
         # 4. ОБРАБОТКА ДАННЫХ
         print("[ANALYZER] Обработка данных...")
         
         # Приводим данные к правильным типам
-        orders_df['артикул'] = orders_df['артикул'].astype(str).str.strip()
-        orders_df['статус'] = orders_df['статус'].astype(str).str.strip().str.lower()
+        # Артикулы уже прочитаны Arrow-строками: strip идёт одним вычислением над буфером столбца
+        orders_articles = orders_df['артикул'].str.strip()
+        revenue_articles = revenue_df['артикул'].str.strip()
+        cost_articles = cost_df['артикул'].str.strip()
         
-        # Считаем доставленные и отменённые
-        delivered_mask = orders_df['статус'].str.contains('доставлен')
-        cancelled_mask = orders_df['статус'].str.contains('отмен')
-        
-        delivered = orders_df[delivered_mask].groupby('артикул').size()
-        cancelled = orders_df[cancelled_mask].groupby('артикул').size()
+        # Артикулы всех трёх файлов кодируются один раз общим словарём, дальше все groupby идут
+        # по целочисленным кодам. factorize нумерует значения в порядке появления, поэтому артикулы
+        # заказов получают коды 0..n_articles-1 - это ровно строки отчёта, без join.
+        # Пустые артикулы получают код -1 и в агрегаты не попадают
+        n_orders, n_revenue = len(orders_articles), len(revenue_articles)
+        article_codes, article_names = pd.factorize(
+            pd.concat([orders_articles, revenue_articles, cost_articles], ignore_index=True)
+        )
+        article_codes = article_codes.astype(np.int32)
+        orders_codes = article_codes[:n_orders]
+        revenue_codes = article_codes[n_orders:n_orders + n_revenue]
+        cost_codes = article_codes[n_orders + n_revenue:]
+        n_articles = int(orders_codes.max(initial=-1)) + 1
+        all_articles = pd.Index(article_names[:n_articles], name='артикул')
         
-        # Все уникальные артикулы
-        all_articles = pd.Index(orders_df['артикул'].unique(), name='артикул')
+        # Считаем доставленные и отменённые. Разных статусов всего с десяток: нормализуем
+        # и проверяем только уникальные значения, а маски по строкам берём по кодам категорий
+        status = orders_df['статус'].astype('category')
+        status_names = [str(name).strip().lower().replace('ё', 'е') for name in status.cat.categories]
+        status_codes = status.cat.codes.to_numpy()
+        # Пустой статус имеет код -1 и попадает на добавленный в конец False
+        delivered_mask = np.array([bool(DELIVERED_STATUS.search(name)) for name in status_names] + [False])[status_codes]
+        cancelled_mask = np.array([bool(CANCELLED_STATUS.search(name)) for name in status_names] + [False])[status_codes]
         
-        # Реиндексируем
-        delivered = delivered.reindex(all_articles, fill_value=0).astype('int32')
-        cancelled = cancelled.reindex(all_articles, fill_value=0).astype('int32')
+        # Количества - гистограмма по кодам артикулов: np.bincount вместо groupby.
+        # Строки с пустым артикулом (код -1) отбрасываются до подсчёта
+        has_article = orders_codes >= 0
+        delivered_counts = np.bincount(orders_codes[has_article & delivered_mask], minlength=n_articles)
+        cancelled_counts = np.bincount(orders_codes[has_article & cancelled_mask], minlength=n_articles)
         
-        # Выручка
-        revenue_df['артикул'] = revenue_df['артикул'].astype(str).str.strip()
-        revenue_sum = revenue_df.groupby('артикул')['сумма итого, руб.'].sum().astype('float32')
+        # Выручка и цены агрегируются сразу в порядке кодов артикулов - выравнивать их не нужно
+        revenue_values = _to_float(revenue_df['сумма итого, руб.'])
+        revenue_sum, _ = _sum_by_code(revenue_codes, revenue_values, n_articles)
         
-        # Цены
-        cost_df['артикул'] = cost_df['артикул'].astype(str).str.strip()
-        cost_avg = cost_df.groupby('артикул')['закупочная цена'].mean().astype('float32')
+        # Цены - среднее по артикулу; без цены остаётся NaN
+        cost_values = _to_float(cost_df['закупочная цена'])
+        cost_sum, cost_count = _sum_by_code(cost_codes, cost_values, n_articles)
+        cost_avg = np.divide(cost_sum, cost_count, out=np.full(n_articles, np.nan), where=cost_count > 0)
         
         # 5. ФОРМИРОВАНИЕ ОТЧЕТА
         print("[ANALYZER] Формирование отчета...")
         
-        report_df = pd.DataFrame({
-            'Продано заказов': delivered,
-            'Отменено заказов': cancelled
-        }, index=all_articles)
+        # Весь отчёт - один float32-массив: по строке на столбец, последний элемент - "Итого".
+        # DataFrame получает из него единственный блок без консолидации, а каждый столбец лежит в памяти подряд
+        columns = ['Продано заказов', 'Отменено заказов', 'сумма итого, руб.', 'закупочная цена за шт', 'Прибыль']
+        values = np.empty((len(columns), n_articles + 1), dtype=np.float32)
+        sold, cancelled, revenue, cost, profit = values[:, :-1]
         
-        report_df = report_df.join(revenue_sum, how='left').fillna(0)
-        report_df = report_df.join(cost_avg, how='left')
-        report_df = report_df.rename(columns={'закупочная цена': 'закупочная цена за шт'})
+        # Агрегаты уже выровнены по кодам артикулов - копируем их без цепочки join
+        sold[:] = delivered_counts
+        cancelled[:] = cancelled_counts
+        revenue[:] = revenue_sum
+        cost[:] = cost_avg
         
-        # Прибыль
-        report_df['Прибыль'] = report_df['сумма итого, руб.'] - (
-            report_df['Продано заказов'] * report_df['закупочная цена за шт'].fillna(0)
-        )
-        report_df['Прибыль'] = report_df['Прибыль'].astype('float32')
-        
-        # Итоговая строка
-        total_row = pd.DataFrame({
-            'Продано заказов': [report_df['Продано заказов'].sum()],
-            'Отменено заказов': [report_df['Отменено заказов'].sum()],
-            'сумма итого, руб.': [report_df['сумма итого, руб.'].sum()],
-            'закупочная цена за шт': [None],
-            'Прибыль': [report_df['Прибыль'].sum()]
-        }, index=['Итого'])
-        
-        report_df = pd.concat([report_df, total_row])
+        # Прибыль - один проход без промежуточных массивов, артикулы без цены считаются по нулевой закупке
+        compute_profit(revenue, sold, cost, profit)
+        
+        # Итоговая строка: суммы по столбцам, средняя закупочная цена в итог не входит
+        values[:, -1] = values[:, :-1].sum(axis=1, dtype=np.float64)
+        values[3, -1] = np.nan
+        
+        report_df = pd.DataFrame(values.T, index=all_articles.append(pd.Index(['Итого'])),
+                                 columns=columns, copy=False)
         report_df.index.name = 'Артикул'
+        # Количества считались в общем float32-блоке, но в отчёт идут целыми числами (2, а не 2.0)
+        report_df = report_df.astype({'Продано заказов': np.int64, 'Отменено заказов': np.int64})
         
         print("[ANALYZER] Анализ успешно завершён!")
         return report_df
@@ -153,4 +436,15 @@ def analyze_files(file_orders, file_revenue, file_costs):
         print(f"[ERROR] Критическая ошибка в analyze_files: {str(e)}")
         import traceback
         print(f"[ERROR] Traceback: {traceback.format_exc()}")
-        raise  # Пробрасываем ошибку дальше
\ No newline at end of file
+        raise  # Пробрасываем ошибку дальше
+
+
+def _warmup():
+    # Компилируем ядро прибыли (или берём его из кэша numba) при импорте модуля,
+    # чтобы первый запрос не ждал JIT-компиляции. Типы те же, что в analyze_files
+    values = np.zeros((4, 1), dtype=np.float32)
+    revenue, sold, cost, out = values
+    compute_profit(revenue, sold, cost, out)
+
+
+_warmup()
@@ -1,19 +1,13 @@
 # app.py
 from flask import Flask, render_template, request, send_file, flash
-import os
-from werkzeug.utils import secure_filename
 import pandas as pd
 from io import BytesIO
 from analyzer import analyze_files  # Импортируем функцию из нового файла
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = '59ccb0fef601d35a2fbacc41dd5f6ec1563a8d04c53e14db3ee2fdc770de7afe'  # Сгенерируйте новый ключ
-app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
 
-# Создаем папку для загрузок
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-
 ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
 
 def allowed_file(filename):
@@ -48,47 +42,38 @@ def index():
             return render_template('index.html')
         
         try:
-            # Сохраняем файлы временно
-            orders_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(file_orders.filename))
-            revenue_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(file_revenue.filename))
-            costs_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(file_costs.filename))
-            
-            file_orders.save(orders_path)
-            file_revenue.save(revenue_path)
-            file_costs.save(costs_path)
-            
-            # Выполняем анализ с помощью функции из analyzer.py
-            result_df = analyze_files(orders_path, revenue_path, costs_path)
+            # Выполняем анализ с помощью функции из analyzer.py.
+            # Файлы читаются прямо из потоков загрузки, без сохранения на диск
+            result_df = analyze_files(file_orders.stream, file_revenue.stream, file_costs.stream)
             
-            # Создаем Excel файл в памяти
             output = BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                result_df.to_excel(writer, sheet_name='Отчет')
+            if request.args.get('fmt') == 'csv':
+                # CSV пишется в разы быстрее xlsx; BOM нужен, чтобы Excel понял кириллицу
+                result_df.to_csv(output, encoding='utf-8-sig')
+                mimetype = 'text/csv'
+                download_name = 'отчет_по_артикулам_с_прибылью.csv'
+            else:
+                # Создаем Excel файл через xlsxwriter. Режим constant_memory не включаем:
+                # to_excel пишет не строго по строкам, и в этом режиме ячейки уже сброшенных строк молча теряются
+                with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+                    result_df.to_excel(writer, sheet_name='Отчет')
+                mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+                download_name = 'отчет_по_артикулам_с_прибылью.xlsx'
             
             output.seek(0)
             
-            # Удаляем временные файлы
-            os.remove(orders_path)
-            os.remove(revenue_path)
-            os.remove(costs_path)
-            
             # Отправляем файл пользователю
             return send_file(
                 output,
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                mimetype=mimetype,
                 as_attachment=True,
-                download_name='отчет_по_артикулам_с_прибылью.xlsx'
+                download_name=download_name
             )
             
         except KeyError as e:
             flash(f'Ошибка в структуре файла: {str(e)}')
         except Exception as e:
             flash(f'Произошла ошибка при обработке: {str(e)}')
-        
-        # Если произошла ошибка, удаляем временные файлы
-        for path in [orders_path, revenue_path, costs_path]:
-            if os.path.exists(path):
-                os.remove(path)
     
     return render_template('index.html')
 